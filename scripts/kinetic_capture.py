@@ -16,46 +16,71 @@ ID_PREFIX = {
     "person": "R",
 }
 
+FIELDNAMES = ["id","type","text","status","bucket","parent_id","goal_ids","aor_id","people","notes","created_at","updated_at","target_date","due_date"]
+BLANK_ROW = dict.fromkeys(FIELDNAMES,"")
+
+TYPE_PREFIXES = {
+    "p:": "project",
+    "g:": "goal",
+    "c:": "commitment",
+    "n:": "note",
+    "a:": "aor",
+}
+
 def load_ledger():
     rows = []
     if not os.path.exists(LEDGER_PATH):
-        return rows
+        return rows, FIELDNAMES
     with open(LEDGER_PATH, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
+        reader = csv.reader(f)
+        header = next(reader, None) or FIELDNAMES
+        n = len(header)
         for r in reader:
-            rows.append(r)
-    return rows
-
-def write_ledger(rows):
-    if not rows:
-        with open(LEDGER_PATH,"w",newline="",encoding="utf-8") as f:
-            w=csv.writer(f); w.writerow(["id","type","text","status","bucket","parent_id","goal_ids","aor_id","people","notes","created_at","updated_at","target_date","due_date"])
-        return
-    fieldnames = rows[0].keys()
-    with open(LEDGER_PATH,"w",newline="",encoding="utf-8") as f:
-        w=csv.DictWriter(f,fieldnames=fieldnames); w.writeheader()
-        for r in rows: w.writerow(r)
+            if not r: continue
+            if len(r) > n:
+                raise ValueError(f"{LEDGER_PATH} line {reader.line_num}: {len(r)} fields, header has {n}")
+            if len(r) < n: r += [""] * (n - len(r))
+            rows.append(dict(zip(header, r)))
+    return rows, header + [k for k in FIELDNAMES if k not in header]
 
-def next_id(rows,obj_type):
-    prefix = ID_PREFIX.get(obj_type,"X")
-    max_num = 0
+def check_fields(rows,fields):
+    known=set(fields)
     for r in rows:
-        rid = r.get("id","")
-        if rid.startswith(prefix):
-            try:
-                num=int(rid[len(prefix):])
-                max_num=max(max_num,num)
-            except: pass
-    return f"{prefix}{max_num+1}"
+        extra=[k for k in r if k not in known]
+        if extra: raise ValueError(f"ledger row {r.get('id','')!r} has fields not in the ledger header: {extra}")
+
+def write_ledger(rows,fields=FIELDNAMES):
+    check_fields(rows,fields)
+    tmp=LEDGER_PATH+".tmp"
+    try:
+        with open(tmp,"w",newline="",encoding="utf-8") as f:
+            w=csv.writer(f); w.writerow(fields)
+            w.writerows([[r.get(k,"") for k in fields] for r in rows])
+            f.flush(); os.fsync(f.fileno())
+        os.replace(tmp,LEDGER_PATH)
+    except BaseException:
+        if os.path.exists(tmp): os.remove(tmp)
+        raise
+
+def track_id(max_num,rid):
+    try: num=int(rid[1:])
+    except ValueError: return
+    if num>max_num.get(rid[:1],0): max_num[rid[:1]]=num
+
+def max_ids(rows):
+    max_num={}
+    for r in rows: track_id(max_num,r.get("id",""))
+    return max_num
+
+def next_id(max_num,obj_type):
+    prefix=ID_PREFIX.get(obj_type,"X")
+    max_num[prefix]=max_num.get(prefix,0)+1
+    return f"{prefix}{max_num[prefix]}"
 
 def infer_type(line):
     t=line.strip()
-    low=t.lower()
-    if low.startswith("p:"): return "project", t[2:].strip()
-    if low.startswith("g:"): return "goal", t[2:].strip()
-    if low.startswith("c:"): return "commitment", t[2:].strip()
-    if low.startswith("n:"): return "note", t[2:].strip()
-    if low.startswith("a:"): return "aor", t[2:].strip()
+    obj_type=TYPE_PREFIXES.get(t[:2].lower())
+    if obj_type: return obj_type, t[2:].strip()
     return "task", t
 
 def capture():
@@ -76,28 +101,14 @@ def capture():
         obj_type,text=infer_type(s)
         entries.append((obj_type,text,s))
     if not entries: return
-    rows=load_ledger()
+    rows,fields=load_ledger()
     now=datetime.datetime.utcnow().isoformat()
+    ids=max_ids(rows)
     for obj_type,text,raw in entries:
-        new_id=next_id(rows,obj_type)
-        rows.append({
-            "id":new_id,
-            "type":obj_type,
-            "text":text,
-            "status":"open",
-            "bucket":"",
-            "parent_id":"",
-            "goal_ids":"",
-            "aor_id":"",
-            "people":"",
-            "notes":"",
-            "created_at":now,
-            "updated_at":now,
-            "target_date":"",
-            "due_date":""
-        })
+        new_id=next_id(ids,obj_type)
+        rows.append(dict(BLANK_ROW,id=new_id,type=obj_type,text=text,status="open",created_at=now,updated_at=now))
         print(f"Captured {obj_type} -> {new_id}: {text}")
-    write_ledger(rows)
+    write_ledger(rows,fields)
     os.makedirs(os.path.dirname(ARCHIVE_PATH),exist_ok=True)
     with open(ARCHIVE_PATH,"a",encoding="utf-8") as f:
         f.write(f"\n## Capture at {now}\n")
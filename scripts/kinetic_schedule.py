@@ -14,41 +14,70 @@ BUCKET_HEADINGS = {
     "after": "after",
 }
 
+FIELDNAMES = ["id","type","text","status","bucket","parent_id","goal_ids","aor_id","people","notes","created_at","updated_at","target_date","due_date"]
+
+ID_PATTERN = re.compile(r"\(([APTG CNR]\d+)\)")
+CHECKBOX_PATTERN = re.compile(r"^- \[[ xX]\]\s*")
+CHECKED_PREFIXES = ("- [x]","- [X]")
+
 def load_ledger():
     rows=[]
-    if not os.path.exists(LEDGER_PATH): return rows
+    if not os.path.exists(LEDGER_PATH): return rows,FIELDNAMES
     with open(LEDGER_PATH,newline="",encoding="utf-8") as f:
-        r=csv.DictReader(f)
-        for row in r: rows.append(row)
-    return rows
+        r=csv.reader(f)
+        header=next(r,None) or FIELDNAMES
+        n=len(header)
+        for row in r:
+            if not row: continue
+            if len(row)>n: raise ValueError(f"{LEDGER_PATH} line {r.line_num}: {len(row)} fields, header has {n}")
+            if len(row)<n: row+=[""]*(n-len(row))
+            rows.append(dict(zip(header,row)))
+    return rows,header+[k for k in FIELDNAMES if k not in header]
+
+def check_fields(rows,fields):
+    known=set(fields)
+    for r in rows:
+        extra=[k for k in r if k not in known]
+        if extra: raise ValueError(f"ledger row {r.get('id','')!r} has fields not in the ledger header: {extra}")
 
-def write_ledger(rows):
+def write_ledger(rows,fields=FIELDNAMES):
     if not rows: return
-    fields=rows[0].keys()
-    with open(LEDGER_PATH,"w",newline="",encoding="utf-8") as f:
-        w=csv.DictWriter(f,fieldnames=fields); w.writeheader()
-        for r in rows: w.writerow(r)
+    check_fields(rows,fields)
+    tmp=LEDGER_PATH+".tmp"
+    try:
+        with open(tmp,"w",newline="",encoding="utf-8") as f:
+            w=csv.writer(f); w.writerow(fields)
+            w.writerows([[r.get(k,"") for k in fields] for r in rows])
+            f.flush(); os.fsync(f.fileno())
+        os.replace(tmp,LEDGER_PATH)
+    except BaseException:
+        if os.path.exists(tmp): os.remove(tmp)
+        raise
 
 def normalize_heading(t):
     t=t.strip().lower()
-    for k in BUCKET_HEADINGS:
-        if k in t: return BUCKET_HEADINGS[k]
+    for k,bucket in BUCKET_HEADINGS.items():
+        if k in t: return bucket
     return None
 
 def extract_id_and_text(line):
-    m=re.search(r"\(([APTG CNR]\d+)\)",line)
-    if m:
-        oid=m.group(1).strip()
-        text=re.sub(r"\([APTG CNR]\d+\)","",line).strip("- []x")
+    parts=ID_PATTERN.split(line)
+    if len(parts)>1:
+        oid=parts[1].strip()
+        text="".join(parts[::2]).strip("- []x")
         return oid,text.strip()
-    text=re.sub(r"^- \[[ xX]\]\s*","",line).strip()
+    text=CHECKBOX_PATTERN.sub("",line).strip()
     return None,text
 
 def schedule():
     if not os.path.exists(S3_PATH): return
-    rows=load_ledger()
+    rows,fields=load_ledger()
     if not rows: return
     id_index={r["id"]:r for r in rows}
+    text_index={}
+    for r in rows:
+        if r.get("status","")!="deleted":
+            text_index.setdefault(r.get("text","").strip(),[]).append(r)
     with open(S3_PATH,encoding="utf-8") as f: lines=f.readlines()
     now=datetime.datetime.utcnow().isoformat()
     current_bucket=None
@@ -58,23 +87,23 @@ def schedule():
             current_bucket=normalize_heading(s.lstrip("#").strip())
             continue
         if s.startswith("- [") and current_bucket is not None:
-            checked=s.startswith("- [x]") or s.startswith("- [X]")
+            checked=s.startswith(CHECKED_PREFIXES)
             oid,text=extract_id_and_text(s)
             target=None
             if oid and oid in id_index:
                 target=id_index[oid]
             else:
-                c=[r for r in rows if r.get("text","").strip()==text and r.get("status","")!="deleted"]
+                c=text_index.get(text,[])
                 if len(c)==1: target=c[0]
             if not target: continue
             if checked:
-                target["status"]="complete"
-                target["bucket"]=""
+                status,bucket="complete",""
             else:
-                target["status"]=target.get("status") or "open"
-                target["bucket"]=current_bucket or ""
-            target["updated_at"]=now
-    write_ledger(rows)
+                status,bucket=target.get("status") or "open",current_bucket or ""
+            if (target.get("status"),target.get("bucket"))!=(status,bucket):
+                target["status"]=status; target["bucket"]=bucket
+                target["updated_at"]=now
+    write_ledger(rows,fields)
     print("S3 scheduling sync complete.")
 
 if __name__=="__main__":
@@ -15,75 +15,113 @@ ID_PREFIX = {
     "person": "R",
 }
 
+FIELDNAMES = ["id","type","text","status","bucket","parent_id","goal_ids","aor_id","people","notes","created_at","updated_at","target_date","due_date"]
+BLANK_ROW = dict.fromkeys(FIELDNAMES,"")
+
+PROJECT_HEADING_PATTERN = re.compile(r"^##\s+(.+?)\s+\(([APTG CNR]\d+)\)\s*$")
+TASK_LINE_PATTERN = re.compile(r"^- \[([ xX])\]\s+(.+?)(\(([APTG CNR]\d+)\))?\s*$")
+GOAL_ID_PATTERN = re.compile(r"G\d+")
+
 def load_ledger():
     rows=[]
-    if not os.path.exists(LEDGER_PATH): return rows
+    if not os.path.exists(LEDGER_PATH): return rows,FIELDNAMES
     with open(LEDGER_PATH,newline="",encoding="utf-8") as f:
-        r=csv.DictReader(f)
-        for row in r: rows.append(row)
-    return rows
+        r=csv.reader(f)
+        header=next(r,None) or FIELDNAMES
+        n=len(header)
+        for row in r:
+            if not row: continue
+            if len(row)>n: raise ValueError(f"{LEDGER_PATH} line {r.line_num}: {len(row)} fields, header has {n}")
+            if len(row)<n: row+=[""]*(n-len(row))
+            rows.append(dict(zip(header,row)))
+    return rows,header+[k for k in FIELDNAMES if k not in header]
 
-def write_ledger(rows):
+def check_fields(rows,fields):
+    known=set(fields)
+    for r in rows:
+        extra=[k for k in r if k not in known]
+        if extra: raise ValueError(f"ledger row {r.get('id','')!r} has fields not in the ledger header: {extra}")
+
+def write_ledger(rows,fields=FIELDNAMES):
     if not rows: return
-    fields=rows[0].keys()
-    with open(LEDGER_PATH,"w",newline="",encoding="utf-8") as f:
-        w=csv.DictWriter(f,fieldnames=fields); w.writeheader()
-        for r in rows: w.writerow(r)
+    check_fields(rows,fields)
+    tmp=LEDGER_PATH+".tmp"
+    try:
+        with open(tmp,"w",newline="",encoding="utf-8") as f:
+            w=csv.writer(f); w.writerow(fields)
+            w.writerows([[r.get(k,"") for k in fields] for r in rows])
+            f.flush(); os.fsync(f.fileno())
+        os.replace(tmp,LEDGER_PATH)
+    except BaseException:
+        if os.path.exists(tmp): os.remove(tmp)
+        raise
+
+def track_id(max_num,rid):
+    try: num=int(rid[1:])
+    except ValueError: return
+    if num>max_num.get(rid[:1],0): max_num[rid[:1]]=num
 
-def next_id(rows,obj_type):
+def max_ids(rows):
+    max_num={}
+    for r in rows: track_id(max_num,r.get("id",""))
+    return max_num
+
+def next_id(max_num,obj_type):
     prefix=ID_PREFIX.get(obj_type,"X")
-    max_num=0
-    for r in rows:
-        rid=r.get("id","")
-        if rid.startswith(prefix):
-            try:
-                num=int(rid[len(prefix):])
-                max_num=max(max_num,num)
-            except: pass
-    return f"{prefix}{max_num+1}"
+    max_num[prefix]=max_num.get(prefix,0)+1
+    return f"{prefix}{max_num[prefix]}"
+
+def write_view(name,lines,prev=None):
+    path=os.path.join(VIEWS_DIR,name)
+    content="\n".join(lines)
+    if prev is None and os.path.exists(path):
+        with open(path,encoding="utf-8") as f: prev=f.read()
+    if prev==content: return
+    with open(path,"w",encoding="utf-8") as f:
+        f.write(content)
 
 def parse_projects_view(rows):
     path=os.path.join(VIEWS_DIR,"Projects.md")
-    if not os.path.exists(path): return rows
+    if not os.path.exists(path): return rows,""
     with open(path,encoding="utf-8") as f: lines=f.readlines()
     rows_by_id={r["id"]:r for r in rows}
+    ids=max_ids(rows)
     now=datetime.datetime.utcnow().isoformat()
     current_project=None
     for line in lines:
         s=line.strip()
         if s.startswith("## "):
-            m=re.match(r"^##\s+(.+?)\s+\(([APTG CNR]\d+)\)\s*$",s)
+            m=PROJECT_HEADING_PATTERN.match(s)
             if m:
                 name=m.group(1).strip()
                 pid=m.group(2).strip()
                 current_project=pid
                 if pid in rows_by_id:
-                    pr=rows_by_id[pid]; pr["text"]=name; pr["updated_at"]=now
+                    pr=rows_by_id[pid]
+                    if pr.get("text")!=name: pr["text"]=name; pr["updated_at"]=now
                 else:
-                    rows.append({
-                        "id":pid,"type":"project","text":name,"status":"open","bucket":"","parent_id":"","goal_ids":"","aor_id":"","people":"","notes":"","created_at":now,"updated_at":now,"target_date":"","due_date":""
-                    })
+                    rows.append(dict(BLANK_ROW,id=pid,type="project",text=name,status="open",created_at=now,updated_at=now))
                     rows_by_id[pid]=rows[-1]
+                    track_id(ids,pid)
             continue
         if s.startswith("- [") and current_project:
-            checked=s.startswith("- [x]") or s.startswith("- [X]")
-            m=re.match(r"^- \[[ xX]\]\s+(.+?)(\(([APTG CNR]\d+)\))?\s*$",s)
+            m=TASK_LINE_PATTERN.match(s)
             if not m: continue
-            text=m.group(1).strip(); tid=m.group(3).strip() if m.group(3) else None
+            checked=m.group(1)!=" "
+            text=m.group(2).strip(); tid=m.group(4).strip() if m.group(4) else None
             if tid and tid in rows_by_id:
                 tr=rows_by_id[tid]
-                tr["text"]=text; tr["parent_id"]=current_project
-                tr["status"]="complete" if checked else (tr.get("status") or "open")
-                tr["updated_at"]=now
+                status="complete" if checked else (tr.get("status") or "open")
+                if (tr.get("text"),tr.get("parent_id"),tr.get("status"))!=(text,current_project,status):
+                    tr["text"]=text; tr["parent_id"]=current_project; tr["status"]=status
+                    tr["updated_at"]=now
             else:
-                new_id=next_id(rows,"task")
-                rows.append({
-                    "id":new_id,"type":"task","text":text,"status":"complete" if checked else "open","bucket":"","parent_id":current_project,"goal_ids":"","aor_id":"","people":"","notes":"","created_at":now,"updated_at":now,"target_date":"","due_date":""
-                })
+                new_id=next_id(ids,"task")
+                rows.append(dict(BLANK_ROW,id=new_id,type="task",text=text,status="complete" if checked else "open",parent_id=current_project,created_at=now,updated_at=now))
                 rows_by_id[new_id]=rows[-1]
-    return rows
+    return rows,"".join(lines)
 
-def generate_projects_view(rows):
+def generate_projects_view(rows,prev=None):
     projects=[r for r in rows if r.get("type")=="project"]
     tasks=[r for r in rows if r.get("type")=="task"]
     tasks_by_project={}
@@ -103,17 +141,20 @@ def generate_projects_view(rows):
                 checked="x" if t.get("status")=="complete" else " "
                 lines.append(f"- [{checked}] {t['text']} ({t['id']})")
         lines.append("")
-    with open(os.path.join(VIEWS_DIR,"Projects.md"),"w",encoding="utf-8") as f:
-        f.write("\n".join(lines))
+    write_view("Projects.md",lines,prev)
 
 def generate_goals_view(rows):
     goals=[r for r in rows if r.get("type")=="goal"]
-    projects=[r for r in rows if r.get("type")=="project"]
+    projects_by_goal={}
+    for p in rows:
+        if p.get("type")!="project": continue
+        for gid in dict.fromkeys(GOAL_ID_PATTERN.findall(p.get("goal_ids","") or "")):
+            projects_by_goal.setdefault(gid,[]).append(p)
     lines=["# Goals",""]
     for g in sorted(goals,key=lambda r:r.get("text","").lower()):
         gid=g["id"]
         lines.append(f"## {g['text']} ({gid})")
-        g_projects=[p for p in projects if gid in (p.get("goal_ids","") or "")]
+        g_projects=projects_by_goal.get(gid,[])
         lines.append("Projects:")
         if g_projects:
             for p in g_projects:
@@ -121,17 +162,19 @@ def generate_goals_view(rows):
         else:
             lines.append("- (none yet)")
         lines.append("")
-    with open(os.path.join(VIEWS_DIR,"Goals.md"),"w",encoding="utf-8") as f:
-        f.write("\n".join(lines))
+    write_view("Goals.md",lines)
 
 def generate_aors_view(rows):
     aors=[r for r in rows if r.get("type")=="aor"]
-    projects=[r for r in rows if r.get("type")=="project"]
+    projects_by_aor={}
+    for p in rows:
+        if p.get("type")=="project":
+            projects_by_aor.setdefault(p.get("aor_id",""),[]).append(p)
     lines=["# AORs",""]
     for a in sorted(aors,key=lambda r:r.get("text","").lower()):
         aid=a["id"]
         lines.append(f"## {a['text']} ({aid})")
-        a_projects=[p for p in projects if p.get("aor_id","")==aid]
+        a_projects=projects_by_aor.get(aid,[])
         lines.append("Projects:")
         if a_projects:
             for p in a_projects:
@@ -139,24 +182,23 @@ def generate_aors_view(rows):
         else:
             lines.append("- (none yet)")
         lines.append("")
-    with open(os.path.join(VIEWS_DIR,"AORs.md"),"w",encoding="utf-8") as f:
-        f.write("\n".join(lines))
+    write_view("AORs.md",lines)
 
 def generate_people_view(rows):
     people_map={}
     for r in rows:
         people=(r.get("people","") or "").strip()
         if not people: continue
-        for p in [x.strip() for x in people.split(",") if x.strip()]:
-            people_map.setdefault(p,[]).append(r)
+        for p in people.split(","):
+            p=p.strip()
+            if p: people_map.setdefault(p,[]).append(r)
     lines=["# People",""]
     for person in sorted(people_map.keys()):
         lines.append(f"## {person}")
         for obj in people_map[person]:
             lines.append(f"- {obj['type']}: {obj['text']} ({obj['id']})")
         lines.append("")
-    with open(os.path.join(VIEWS_DIR,"People.md"),"w",encoding="utf-8") as f:
-        f.write("\n".join(lines))
+    write_view("People.md",lines)
 
 def generate_today_snapshot_view(rows):
     today=[r for r in rows if r.get("bucket")=="today" and r.get("status")!="deleted"]
@@ -175,20 +217,19 @@ def generate_today_snapshot_view(rows):
             lines.append(f"- [x] {t['text']} ({t['id']})")
     else:
         lines.append("- (none)")
-    with open(os.path.join(VIEWS_DIR,"Today_Snapshot.md"),"w",encoding="utf-8") as f:
-        f.write("\n".join(lines))
+    write_view("Today_Snapshot.md",lines)
 
 def main():
-    rows=load_ledger()
+    rows,fields=load_ledger()
     if not rows:
         print("Ledger empty; nothing to sync."); return
-    rows=parse_projects_view(rows)
-    generate_projects_view(rows)
+    rows,projects_md=parse_projects_view(rows)
+    generate_projects_view(rows,projects_md)
     generate_goals_view(rows)
     generate_aors_view(rows)
     generate_people_view(rows)
     generate_today_snapshot_view(rows)
-    write_ledger(rows)
+    write_ledger(rows,fields)
     print("Views synced.")
 
 if __name__=="__main__":